@@ -0,0 +1,179 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+from cachetools import TTLCache
+from exceptions import OverloadedError
+
+
+class AdmissionController:
+    """
+    Limits concurrent executions of an expensive operation, such as an AI request.
+
+    Each user has a token bucket refilled at a steady rate. Admitted requests run while
+    fewer than max_concurrent are active, otherwise they wait in a bounded queue until a
+    slot frees up or their queue deadline passes. Requests that cannot be admitted are
+    rejected immediately with OverloadedError so they never tie up a worker for long.
+    """
+
+    def __init__(self, max_concurrent: int = 4, max_queue: int = 8, queue_timeout: float = 10.0,
+                 rate: float = 0.1, burst: int = 3, max_users: int = 10000):
+        """
+        Args:
+            max_concurrent (int, optional): Requests allowed to run at once. Defaults to 4.
+            max_queue (int, optional): Requests allowed to wait for a slot. Defaults to 8.
+            queue_timeout (float, optional): Seconds a request may wait for a slot. Defaults to 10.0.
+            rate (float, optional): Tokens added to each user's bucket per second. Defaults to 0.1.
+            burst (int, optional): Capacity of each user's bucket. Defaults to 3.
+            max_users (int, optional): Buckets tracked at once, idle users are forgotten first. Defaults to 10000.
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.rate = rate
+        self.burst = burst
+
+        self._condition = threading.Condition()
+        # A bucket left idle long enough to refill completely is equivalent to a new one
+        self._buckets = TTLCache(maxsize=max_users, ttl=burst / rate)
+        self._active = 0
+        self._queued = 0
+        self._admitted = 0
+        self._rate_limited = 0
+        self._queue_full = 0
+        self._timed_out = 0
+
+    def _tokens(self, user_id: str, now: float) -> float:
+        """Tokens in the user's bucket after refilling up to now. Caller holds the lock."""
+        tokens, updated = self._buckets.get(user_id, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def _take_token(self, user_id: str, now: float):
+        """Take a token from the user's bucket. Caller holds the lock."""
+        tokens = self._tokens(user_id, now)
+        if tokens < 1:
+            self._rate_limited += 1
+            self._buckets[user_id] = (tokens, now)
+            raise OverloadedError("Too many generation requests", 429, math.ceil((1 - tokens) / self.rate))
+        self._buckets[user_id] = (tokens - 1, now)
+
+    def _refund_token(self, user_id: str):
+        """Return a token to the user's bucket for a request the server shed. Caller holds the lock."""
+        tokens, updated = self._buckets.get(user_id, (self.burst, time.monotonic()))
+        self._buckets[user_id] = (min(self.burst, tokens + 1), updated)
+
+    def _retry_after(self) -> int:
+        """Rough seconds until a queued request would be admitted. Caller holds the lock."""
+        return max(1, math.ceil(self.queue_timeout * (self._queued + 1) / self.max_concurrent))
+
+    def check(self, user_id: str):
+        """
+        Reject a request that would not be admitted right now, without taking a token or a slot.
+        Lets callers skip expensive preparation for requests that are going to be shed anyway.
+
+        Args:
+            user_id (str): The user making the request.
+
+        Raises:
+            OverloadedError: 429 if the user is rate limited, 503 if the queue is full.
+        """
+        now = time.monotonic()
+        with self._condition:
+            tokens = self._tokens(user_id, now)
+            if tokens < 1:
+                self._rate_limited += 1
+                raise OverloadedError("Too many generation requests", 429, math.ceil((1 - tokens) / self.rate))
+
+            if self._active >= self.max_concurrent and self._queued >= self.max_queue:
+                self._queue_full += 1
+                raise OverloadedError("Server is busy, try again later", 503, self._retry_after())
+
+    def acquire(self, user_id: str):
+        """
+        Admit a request, waiting in the queue if all slots are busy.
+
+        Args:
+            user_id (str): The user making the request.
+
+        Raises:
+            OverloadedError: 429 if the user is rate limited, 503 if the queue is full or the deadline passed.
+        """
+        now = time.monotonic()
+        deadline = now + self.queue_timeout
+
+        with self._condition:
+            self._take_token(user_id, now)
+
+            if self._active < self.max_concurrent and self._queued == 0:
+                self._active += 1
+                self._admitted += 1
+                return
+
+            if self._queued >= self.max_queue:
+                self._queue_full += 1
+                self._refund_token(user_id)
+                raise OverloadedError("Server is busy, try again later", 503, self._retry_after())
+
+            self._queued += 1
+            try:
+                while self._active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timed_out += 1
+                        self._refund_token(user_id)
+                        raise OverloadedError("Server is busy, try again later", 503, self._retry_after())
+                    self._condition.wait(remaining)
+            finally:
+                self._queued -= 1
+
+            self._active += 1
+            self._admitted += 1
+
+    def release(self):
+        """
+        Free the slot held by an admitted request.
+        """
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def admit(self, user_id: str) -> Iterator[None]:
+        """
+        Hold a slot for the duration of a with block.
+
+        Args:
+            user_id (str): The user making the request.
+
+        Raises:
+            OverloadedError: If the request is not admitted, see acquire.
+
+        Usage:
+            with controller.admit(user_id):
+                response = promptAI(prompt)
+        """
+        self.acquire(user_id)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the current load and the number of requests admitted and shed.
+
+        Returns:
+            Dict[str, int]: Active and queued requests, admitted requests and shed counts by reason.
+        """
+        with self._condition:
+            return {
+                "active": self._active,
+                "queued": self._queued,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "admitted": self._admitted,
+                "rate_limited": self._rate_limited,
+                "queue_full": self._queue_full,
+                "timed_out": self._timed_out,
+            }
@@ -8,6 +8,7 @@ from firebase_admin import firestore
 from datetime import datetime, timedelta, timezone
 import sys
 import os
+import time
 
 # Add the parent directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -17,6 +18,17 @@ from exceptions import ClientError
 if not firebase_admin:
     initialize_app()
 
+# Cached action plans are rounded to the nearest hour, so they roll over at half past
+CACHED_DATA_TTL = 3600
+CACHED_DATA_OFFSET = 1800
+
+# Buildings with precomputed action plans in get_cached_data
+PRECOMPUTED_BUILDINGS = ("Dallas Office", "Dubai Office")
+
+def building_key(user_id: str, building_name: str) -> str:
+    """Unique key for a user's building, shared by the local caches and stores."""
+    return f"{user_id}/{building_name}"
+
 def get_building_id(user_id: str, building_name: str) -> Optional[str]:
     """
     Retrieve the building ID for the specified building name.
@@ -42,6 +54,58 @@ def get_building_id(user_id: str, building_name: str) -> Optional[str]:
 
     return None
 
+def get_building_names(user_id: str) -> List[str]:
+    """
+    Retrieve the names of all buildings belonging to the user.
+
+    Args:
+        user_id (str): The user ID.
+
+    Returns:
+        List[str]: The building names.
+    """
+    db = firestore.Client()
+
+    try:
+        offices = db.collection('users').document(user_id).collection('offices').stream()
+        return [office.get('office_name') for office in offices]
+
+    except Exception as e:
+        raise ClientError(f"Error retrieving buildings: {e}")
+
+def add_energy_usage(user_id: str, building_name: str, timestamp: datetime, energy_usage_kWh: float) -> str:
+    """
+    Store an energy usage reading for the specified building.
+
+    Args:
+        user_id (str): The user ID.
+        building_name (str): The building name.
+        timestamp (datetime): Time of the reading.
+        energy_usage_kWh (float): Energy used in kWh.
+
+    Returns:
+        str: The ID of the stored reading.
+
+    Raises:
+        ClientError: If the building does not exist or the reading could not be stored.
+    """
+    building_id = get_building_id(user_id, building_name)
+    if building_id is None:
+        raise ClientError(f"Building {building_name} not found", 404)
+
+    db = firestore.Client()
+
+    try:
+        building_ref = db.collection('users').document(user_id).collection('offices').document(building_id)
+        usage_ref = building_ref.collection('energy_usage').add({
+            'timestamp': timestamp,
+            'energy_usage_kWh': energy_usage_kWh
+        })[1]
+        return usage_ref.id
+
+    except Exception as e:
+        raise ClientError(f"Error storing energy usage: {e}")
+
 def get_cached_data(user_id: str, building_name: str) -> List[Dict[str, str]]:
     """
     Get cached building data with proper timezone adjustments and error handling.
@@ -110,6 +174,23 @@ def get_cached_data(user_id: str, building_name: str) -> List[Dict[str, str]]:
         logging.error(f"Error in get_cached_data for user {user_id}, building {building_name}: {str(e)}")
         raise
 
+def get_cached_data_version(building_name: str) -> Optional[Tuple[str, int]]:
+    """
+    Get the version of the data get_cached_data returns for a building, without building it.
+    The data only depends on the time rounded to the nearest hour, so that hour is its version.
+
+    Args:
+        building_name (str): The building name.
+
+    Returns:
+        Optional[Tuple[str, int]]: The version string and the seconds until it changes,
+            or None if the building has no precomputed data.
+    """
+    if building_name not in PRECOMPUTED_BUILDINGS:
+        return None
+    now = int(time.time()) + CACHED_DATA_OFFSET
+    return f"{building_name}:{now // CACHED_DATA_TTL}", CACHED_DATA_TTL - now % CACHED_DATA_TTL
+
 def __fillDatabase():
     """
     Populate the database with simulated office data and energy usage.
@@ -0,0 +1,341 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
+import numpy as np
+from firebase_admin import firestore
+import sys
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from exceptions import ClientError
+from database.data import get_building_id, building_key
+
+TIMESTAMP_DTYPE = np.dtype('<i8')
+VALUE_DTYPE = np.dtype('<f8')
+
+AGGREGATES = {
+    'sum': np.sum,
+    'mean': np.mean,
+    'min': np.min,
+    'max': np.max,
+}
+
+
+class SeriesStore:
+    """
+    Local store of energy usage series, one per building, optimized for appends.
+
+    Each series is a directory with two flat files, UNIX timestamps in seconds as int64 and
+    kWh as float64, plus an index.json holding the committed length, last timestamp and a
+    generation bumped whenever late readings rewrite the files. New readings are appended
+    before the index is replaced, so a crash leaves at worst some ignored trailing bytes.
+    Reads memory-map the files and return views, so range queries only binary search the
+    timestamps and never copy the series.
+    """
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root (str): Directory holding the series.
+        """
+        self.root = root
+        self._lock = threading.Lock()
+        self._maps: Dict[str, Tuple[Tuple[int, int], np.ndarray, np.ndarray]] = {}
+
+    def _path(self, key: str, name: str) -> str:
+        """Path of a file in a series directory. Keys are percent-encoded, so distinct keys never share a directory."""
+        return os.path.join(self.root, quote(key, safe='').replace('.', '%2E'), name)
+
+    def _index(self, key: str) -> dict:
+        """Read the index of a series, empty if it does not exist."""
+        try:
+            with open(self._path(key, 'index.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'length': 0, 'last_timestamp': None, 'generation': 0}
+
+    def _write_index(self, key: str, index: dict):
+        """Atomically replace the index of a series."""
+        tmp_path = self._path(key, 'index.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._path(key, 'index.json'))
+
+    def _map(self, key: str, index: dict) -> Tuple[np.ndarray, np.ndarray]:
+        """Memory-map the committed part of a series. Caller holds the lock."""
+        version = (index['length'], index.get('generation', 0))
+        cached = self._maps.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+        if index['length'] == 0:
+            return np.empty(0, TIMESTAMP_DTYPE), np.empty(0, VALUE_DTYPE)
+
+        timestamps = np.memmap(self._path(key, 'timestamps.i8'), TIMESTAMP_DTYPE, mode='r', shape=(index['length'],))
+        values = np.memmap(self._path(key, 'values.f8'), VALUE_DTYPE, mode='r', shape=(index['length'],))
+        self._maps[key] = (version, timestamps, values)
+        return timestamps, values
+
+    def last_timestamp(self, key: str) -> Optional[int]:
+        """
+        Get the timestamp of the latest reading in a series.
+
+        Args:
+            key (str): Unique key of the series.
+
+        Returns:
+            Optional[int]: UNIX timestamp in seconds, or None if the series is empty.
+        """
+        return self._index(key)['last_timestamp']
+
+    def append(self, key: str, timestamps: np.ndarray, values: np.ndarray) -> int:
+        """
+        Add readings to a series. Readings newer than the last stored reading are appended in place.
+        If any reading is not newer, the series is rewritten from that reading onwards, and a reading
+        with the same timestamp as a stored one replaces its value.
+
+        Args:
+            key (str): Unique key of the series.
+            timestamps (np.ndarray): UNIX timestamps in seconds, in ascending order.
+            values (np.ndarray): Energy usage in kWh for each timestamp.
+
+        Returns:
+            int: The number of readings added to the series, not counting replaced values.
+        """
+        timestamps = np.asarray(timestamps, dtype=TIMESTAMP_DTYPE)
+        values = np.asarray(values, dtype=VALUE_DTYPE)
+        if timestamps.shape != values.shape:
+            raise ClientError("Timestamps and values must have the same length")
+        if np.any(np.diff(timestamps) <= 0):
+            raise ClientError("Timestamps must be strictly increasing")
+        if len(timestamps) == 0:
+            return 0
+
+        with self._lock:
+            index = self._index(key)
+            os.makedirs(os.path.dirname(self._path(key, 'index.json')), exist_ok=True)
+            length = index['length']
+
+            if index['last_timestamp'] is not None and timestamps[0] <= index['last_timestamp']:
+                return self._merge(key, index, timestamps, values)
+
+            for name, data, dtype in (('timestamps.i8', timestamps, TIMESTAMP_DTYPE), ('values.f8', values, VALUE_DTYPE)):
+                with open(self._path(key, name), 'r+b' if length else 'wb') as f:
+                    # Overwrite any bytes left past the committed length by an interrupted append
+                    f.seek(length * dtype.itemsize)
+                    f.write(data.tobytes())
+                    f.truncate()
+
+            self._write_index(key, {
+                'length': length + len(timestamps),
+                'last_timestamp': int(timestamps[-1]),
+                'generation': index.get('generation', 0),
+            })
+            return len(timestamps)
+
+    def _merge(self, key: str, index: dict, timestamps: np.ndarray, values: np.ndarray) -> int:
+        """
+        Merge late readings into a series by rewriting it from the first late reading onwards.
+        The files are written to new paths and swapped in, so arrays already returned by
+        series and range keep their old contents. Caller holds the lock.
+        """
+        stored_timestamps, stored_values = self._map(key, index)
+        start = int(np.searchsorted(stored_timestamps, timestamps[0], side='left'))
+
+        # New readings come last, so after a stable sort they follow stored readings with the same timestamp
+        tail_timestamps = np.concatenate([stored_timestamps[start:], timestamps])
+        tail_values = np.concatenate([stored_values[start:], values])
+        order = np.argsort(tail_timestamps, kind='stable')
+        tail_timestamps, tail_values = tail_timestamps[order], tail_values[order]
+        keep = np.append(tail_timestamps[1:] != tail_timestamps[:-1], True)
+        tail_timestamps, tail_values = tail_timestamps[keep], tail_values[keep]
+
+        for name, head, tail in (('timestamps.i8', stored_timestamps[:start], tail_timestamps),
+                                 ('values.f8', stored_values[:start], tail_values)):
+            tmp_path = self._path(key, name + '.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(head.tobytes())
+                f.write(tail.tobytes())
+            os.replace(tmp_path, self._path(key, name))
+
+        length = start + len(tail_timestamps)
+        self._write_index(key, {
+            'length': length,
+            'last_timestamp': int(tail_timestamps[-1]),
+            'generation': index.get('generation', 0) + 1,
+        })
+        return length - index['length']
+
+    def series(self, key: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get a whole series as read-only memory-mapped arrays.
+
+        Args:
+            key (str): Unique key of the series.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Timestamps and values, empty if the series does not exist.
+        """
+        with self._lock:
+            return self._map(key, self._index(key))
+
+    def range(self, key: str, start: Optional[int] = None, end: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the readings of a series with start <= timestamp < end, as views into the store.
+
+        Args:
+            key (str): Unique key of the series.
+            start (Optional[int], optional): UNIX timestamp in seconds. Defaults to the first reading.
+            end (Optional[int], optional): UNIX timestamp in seconds. Defaults to after the last reading.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Timestamps and values in the range.
+        """
+        timestamps, values = self.series(key)
+        lo = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+        hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side='left'))
+        return timestamps[lo:hi], values[lo:hi]
+
+    def aggregate(self, key: str, start: Optional[int] = None, end: Optional[int] = None, how: str = 'sum') -> Optional[float]:
+        """
+        Aggregate the readings of a series in a range.
+
+        Args:
+            key (str): Unique key of the series.
+            start (Optional[int], optional): UNIX timestamp in seconds. Defaults to the first reading.
+            end (Optional[int], optional): UNIX timestamp in seconds. Defaults to after the last reading.
+            how (str, optional): One of sum, mean, min or max. Defaults to sum.
+
+        Returns:
+            Optional[float]: The aggregate, or None if the range is empty.
+        """
+        if how not in AGGREGATES:
+            raise ClientError(f"Unknown aggregate: {how}")
+        _, values = self.range(key, start, end)
+        if len(values) == 0:
+            return None
+        return float(AGGREGATES[how](values))
+
+    def rollup(self, key: str, start: int, end: int, bucket: int, how: str = 'sum') -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Aggregate the readings of a series into fixed-width time buckets.
+
+        Args:
+            key (str): Unique key of the series.
+            start (int): UNIX timestamp in seconds of the first bucket.
+            end (int): UNIX timestamp in seconds, exclusive.
+            bucket (int): Bucket width in seconds.
+            how (str, optional): One of sum, mean, min or max. Defaults to sum.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Start of each non-empty bucket and its aggregate.
+        """
+        if how not in AGGREGATES:
+            raise ClientError(f"Unknown aggregate: {how}")
+        if bucket <= 0:
+            raise ClientError("Bucket width must be positive")
+
+        timestamps, values = self.range(key, start, end)
+        if len(timestamps) == 0:
+            return np.empty(0, TIMESTAMP_DTYPE), np.empty(0, VALUE_DTYPE)
+
+        buckets = (timestamps - start) // bucket
+        offsets = np.flatnonzero(np.diff(buckets, prepend=-1))
+        bucket_starts = start + buckets[offsets] * bucket
+
+        if how == 'mean':
+            counts = np.diff(offsets, append=len(values))
+            return bucket_starts, np.add.reduceat(values, offsets) / counts
+        ufunc = {'sum': np.add, 'min': np.minimum, 'max': np.maximum}[how]
+        return bucket_starts, ufunc.reduceat(values, offsets)
+
+
+_store: Optional[SeriesStore] = None
+
+def get_series_store() -> SeriesStore:
+    """
+    Get the local series store, rooted at the SERIES_STORE_DIR environment variable or .series.
+    """
+    global _store
+    if _store is None:
+        _store = SeriesStore(os.getenv('SERIES_STORE_DIR', '.series'))
+    return _store
+
+def store_late_energy_usage(user_id: str, building_name: str, timestamp: datetime, energy_usage_kWh: float,
+                            store: Optional[SeriesStore] = None) -> bool:
+    """
+    Write a reading that is not newer than the latest locally stored one straight into the local store.
+    sync_energy_usage only copies newer readings, so it would never pick these up. Newer readings are
+    left to the next sync, so that readings added to Firestore in between are not skipped.
+
+    Args:
+        user_id (str): The user ID.
+        building_name (str): The building name.
+        timestamp (datetime): Time of the reading.
+        energy_usage_kWh (float): Energy used in kWh.
+        store (Optional[SeriesStore], optional): The store to write to. Defaults to the shared store.
+
+    Returns:
+        bool: True if the reading was late and written to the store.
+    """
+    store = store or get_series_store()
+    key = building_key(user_id, building_name)
+    last_timestamp = store.last_timestamp(key)
+    seconds = int(timestamp.timestamp())
+
+    if last_timestamp is None or seconds > last_timestamp:
+        return False
+    store.append(key, [seconds], [energy_usage_kWh])
+    return True
+
+def sync_energy_usage(user_id: str, building_name: str, store: Optional[SeriesStore] = None) -> int:
+    """
+    Copy energy usage readings newer than the latest stored one from Firestore into the local store.
+    Late readings added through ingest_energy_usage are written to the store directly. Late readings
+    written to Firestore by other clients are not picked up until the series is rebuilt.
+
+    Args:
+        user_id (str): The user ID.
+        building_name (str): The building name.
+        store (Optional[SeriesStore], optional): The store to sync into. Defaults to the shared store.
+
+    Returns:
+        int: The number of readings added.
+    """
+    store = store or get_series_store()
+    key = building_key(user_id, building_name)
+
+    building_id = get_building_id(user_id, building_name)
+    if building_id is None:
+        raise ClientError(f"Building {building_name} not found", 404)
+
+    db = firestore.Client()
+
+    try:
+        query = db.collection('users').document(user_id).collection('offices').document(building_id) \
+            .collection('energy_usage').order_by('timestamp')
+        last_timestamp = store.last_timestamp(key)
+        # Stored timestamps are truncated to the second, so start at the next whole second
+        # rather than re-fetching the latest reading and merging it over itself
+        if last_timestamp is not None:
+            query = query.where('timestamp', '>=', datetime.fromtimestamp(last_timestamp + 1, timezone.utc))
+
+        timestamps, values = [], []
+        for reading in query.stream():
+            data = reading.to_dict()
+            timestamps.append(int(data['timestamp'].timestamp()))
+            values.append(data['energy_usage_kWh'])
+
+    except Exception as e:
+        raise ClientError(f"Error syncing energy usage: {e}")
+
+    if not timestamps:
+        return 0
+
+    # Readings sharing a second keep the latest one
+    timestamps = np.asarray(timestamps, dtype=TIMESTAMP_DTYPE)
+    values = np.asarray(values, dtype=VALUE_DTYPE)
+    keep = np.append(np.diff(timestamps) > 0, True)
+    return store.append(key, timestamps[keep], values[keep])
@@ -19,4 +19,17 @@ class ClientError(Exception):
         """
         super().__init__(message)
         self.message = message
-        self.code = code
\ No newline at end of file
+        self.code = code
+
+class OverloadedError(ClientError):
+    def __init__(self, message: str, code: int = 503, retry_after: int = 1):
+        """
+        Exception for requests rejected because the server or the client is over its limits.
+
+        Args:
+            message (str): The error message.
+            code (int, optional): 429 when the client is rate limited, 503 when the server sheds load. Defaults to 503.
+            retry_after (int, optional): Seconds the client should wait before retrying. Defaults to 1.
+        """
+        super().__init__(message, code)
+        self.retry_after = retry_after
@@ -0,0 +1,148 @@
+import math
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional
+import numpy as np
+
+
+class AnomalyDetector:
+    """
+    Incremental anomaly detector for hourly energy usage readings.
+
+    Each building gets one slot in a set of NumPy arrays holding an EWMA level, an EWMA
+    mean per hour of day and an EWMA variance of the residuals against those baselines.
+    Scoring and updating a reading is O(1) and never reads past data, so memory stays
+    fixed per building regardless of history.
+    """
+
+    HOURS = 24
+
+    def __init__(self, alpha: float = 0.05, seasonal_alpha: float = 0.2, threshold: float = 3.0,
+                 warmup: int = 24, seasonal_warmup: int = 3, capacity: int = 64, max_alerts: int = 100):
+        """
+        Args:
+            alpha (float, optional): EWMA weight of a new reading for the level and residual variance. Defaults to 0.05.
+            seasonal_alpha (float, optional): EWMA weight of a new reading for its hour of day. Defaults to 0.2.
+            threshold (float, optional): Absolute z-score above which a reading is an anomaly. Defaults to 3.0.
+            warmup (int, optional): Readings needed before a building can raise alerts. Defaults to 24.
+            seasonal_warmup (int, optional): Readings needed for an hour of day before its baseline is used. Defaults to 3.
+            capacity (int, optional): Initial number of building slots, grown by doubling. Defaults to 64.
+            max_alerts (int, optional): Recent alerts kept per building. Defaults to 100.
+        """
+        self.alpha = alpha
+        self.seasonal_alpha = seasonal_alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.seasonal_warmup = seasonal_warmup
+        self.max_alerts = max_alerts
+
+        self._lock = threading.Lock()
+        self._index: Dict[str, int] = {}
+        self._alerts: Dict[str, Deque[dict]] = {}
+
+        self._mean = np.zeros(capacity)
+        self._var = np.zeros(capacity)
+        self._count = np.zeros(capacity, dtype=np.int64)
+        self._hour_mean = np.zeros((capacity, self.HOURS))
+        self._hour_count = np.zeros((capacity, self.HOURS), dtype=np.int64)
+
+    def _slot(self, key: str) -> int:
+        """Return the array slot for a building, allocating one if needed."""
+        slot = self._index.get(key)
+        if slot is not None:
+            return slot
+
+        slot = len(self._index)
+        if slot == len(self._mean):
+            grow = len(self._mean)
+            self._mean = np.concatenate([self._mean, np.zeros(grow)])
+            self._var = np.concatenate([self._var, np.zeros(grow)])
+            self._count = np.concatenate([self._count, np.zeros(grow, dtype=np.int64)])
+            self._hour_mean = np.vstack([self._hour_mean, np.zeros((grow, self.HOURS))])
+            self._hour_count = np.vstack([self._hour_count, np.zeros((grow, self.HOURS), dtype=np.int64)])
+
+        self._index[key] = slot
+        self._alerts[key] = deque(maxlen=self.max_alerts)
+        return slot
+
+    @staticmethod
+    def _ewma(mean: float, count: int, value: float, alpha: float) -> float:
+        """Return the EWMA after observing value."""
+        if count == 0:
+            return value
+        return mean + alpha * (value - mean)
+
+    def update(self, key: str, timestamp: datetime, value: float) -> Optional[dict]:
+        """
+        Score a new reading against the building's baseline, then fold it into the statistics.
+
+        Args:
+            key (str): Unique key of the building.
+            timestamp (datetime): Time of the reading. Naive timestamps are taken as UTC.
+            value (float): Energy usage in kWh.
+
+        Returns:
+            Optional[dict]: The alert if the reading is anomalous, otherwise None.
+
+        Raises:
+            ValueError: If the value is NaN or infinite, which would poison the statistics for good.
+        """
+        value = float(value)
+        if not math.isfinite(value):
+            raise ValueError(f"Energy usage must be a finite number, got {value}")
+
+        # Bucket by UTC hour so the same instant always lands in the same hour of day
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        timestamp = timestamp.astimezone(timezone.utc)
+        hour = timestamp.hour
+        with self._lock:
+            slot = self._slot(key)
+            count = int(self._count[slot])
+            hour_count = int(self._hour_count[slot, hour])
+
+            # Prefer the hour-of-day baseline once it has enough readings
+            if hour_count >= self.seasonal_warmup:
+                expected = float(self._hour_mean[slot, hour])
+            else:
+                expected = float(self._mean[slot])
+            residual = value - expected if count else 0.0
+
+            alert = None
+            std = float(np.sqrt(self._var[slot]))
+            if count >= self.warmup and std > 0:
+                score = residual / std
+                if abs(score) > self.threshold:
+                    alert = {
+                        "timestamp": timestamp.isoformat(),
+                        "energy_usage_kWh": value,
+                        "expected_kWh": expected,
+                        "score": score,
+                    }
+                    self._alerts[key].append(alert)
+
+            self._var[slot] = self._ewma(self._var[slot], count, residual ** 2, self.alpha)
+            self._mean[slot] = self._ewma(self._mean[slot], count, value, self.alpha)
+            self._hour_mean[slot, hour] = self._ewma(self._hour_mean[slot, hour], hour_count, value, self.seasonal_alpha)
+            self._count[slot] += 1
+            self._hour_count[slot, hour] += 1
+
+            return alert
+
+    def alerts(self, key: str) -> List[dict]:
+        """
+        Get the recent alerts for a building, newest first.
+
+        Args:
+            key (str): Unique key of the building.
+
+        Returns:
+            List[dict]: The alerts, empty if the building has none.
+        """
+        with self._lock:
+            return list(reversed(self._alerts.get(key, ())))
+
+
+# Shared detector for the API process
+detector = AnomalyDetector()
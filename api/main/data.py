@@ -2,9 +2,19 @@ from flask import json
 import os
 import requests
 import re
-from database.data import get_cached_data
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from database.data import get_cached_data, get_cached_data_version, add_energy_usage, get_building_names, building_key
+from database.data import CACHED_DATA_TTL, PRECOMPUTED_BUILDINGS
+from database.series import get_series_store, sync_energy_usage, store_late_energy_usage
+from main.anomaly import detector
+from cachetools import TTLCache
 from dotenv import load_dotenv
-from weather import fetch_weather_data, describe_weather, get_location
+from weather import fetch_weather_data, fetch_hourly_weather_data, get_weather_version, describe_weather, get_location
+from exceptions import ClientError
+from admission import AdmissionController
 import pandas as pd
 # from openai import OpenAI   
 
@@ -43,6 +53,31 @@ Generate 20 responses"""
 
 SECOND_PROMPT = """I'll give you a JSON list of estimatedCarbonEmmissions, estimatedEnergyUse, estimatedEnergyUseUnit and actions. Output the JSON but only choose the actions that include the most context and accurately applies the context to demonstrate complex logical forward thinking skills of forecasting, human behavior, and expectations. Do not choose duplicates, inaccurate, or recommendations that cause worse energy usage. All actions should be done by the AI through pure software api requests, it should NOT require software, hardware, or manual intervention. The action should be a possible and understandable with no negative consequences, such as no turning off the refrigerator as it would cause food to spoil. Output in JSON only, do not add external text."""
 
+BATCH_PROMPT = """Multiple buildings are given below, each under a line of the form "### BUILDING: <name>" followed by its JSON client data. Treat each building independently with its own context. Output one section per building, in the same order, each starting with the exact line "### BUILDING: <name>" followed by only that building's JSON in the format above."""
+
+# Rough token budget for one batched completion, including each building's expected output
+BATCH_TOKEN_BUDGET = 16000
+OUTPUT_TOKENS_PER_BUILDING = 2000
+
+BUILDING_SECTION = re.compile(r"^#+\s*BUILDING:\s*(.+?)\s*$", re.MULTILINE)
+
+# Sample latitude, longitude, and timezone for the buildings
+# Replace these with actual logic for fetching building details
+BUILDING_LOCATIONS = {
+    "Dubai Office": {"latitude": 25.27, "longitude": 55.29, "timezone": "Asia/Dubai"},
+    "Dallas Office": {"latitude": 32.77, "longitude": -96.79, "timezone": "America/Chicago"}
+}
+
+# Shared limits for all AI requests, only requests that reach the AI are counted
+generate_admission = AdmissionController()
+
+# Hours of forecast included in the context sent to the AI
+FORECAST_HOURS = 12
+
+# Generated action plans with the time they were generated, keyed by building
+_plan_cache = TTLCache(maxsize=1024, ttl=CACHED_DATA_TTL)
+_plan_lock = threading.Lock()
+
 def parseGeneratedResponseForJson(response:str) -> dict:
     """
     Parse the response from the generated data API endpoint.
@@ -127,32 +162,251 @@ def promptAI(prompt: str):
         return f"Error: API request failed with status code {response.status_code}"
 
 
+def get_building_version(user_id: str, building_name: str) -> Optional[Tuple[str, int]]:
+    """
+    Version of the data returned by get_building_data, taken from the cached weather entry it is built from.
+
+    Args:
+        user_id (str): The user ID.
+        building_name (str): The building name.
+
+    Returns:
+        Optional[Tuple[str, int]]: The version string and the seconds until the weather expires,
+            or None if the weather is not cached.
+    """
+    location = BUILDING_LOCATIONS.get(building_name)
+    if location is None:
+        return None
+
+    version = get_weather_version(location["latitude"], location["longitude"], location["timezone"])
+    if version is None:
+        return None
+    fetched_at, expires_at = version
+
+    # The day of week is part of the data too, so the version also changes at local midnight
+    now = pd.Timestamp.now(tz=location["timezone"])
+    until_midnight = (now.normalize() + pd.Timedelta(days=1) - now).total_seconds()
+    max_age = max(0, int(min(expires_at - now.timestamp(), until_midnight)))
+    return f"{building_name}:{fetched_at}:{now.day_name()}", max_age
+
+
+def get_generated_version(user_id: str, building_name: str) -> Optional[Tuple[str, int]]:
+    """
+    Version of the data returned by get_generated_data, taken from the precomputed data or the cached plan.
+
+    Args:
+        user_id (str): The user ID.
+        building_name (str): The building name.
+
+    Returns:
+        Optional[Tuple[str, int]]: The version string and the seconds until it changes,
+            or None if no plan is cached for the building.
+    """
+    version = get_cached_data_version(building_name)
+    if version is not None:
+        return version
+
+    with _plan_lock:
+        entry = _plan_cache.get(building_key(user_id, building_name))
+    if entry is None:
+        return None
+    return f"{building_name}:{entry['generated_at']}", max(0, int(entry["generated_at"] + CACHED_DATA_TTL - time.time()))
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Roughly estimate the number of tokens in a text, at about 4 characters per token.
+    """
+    return len(text) // 4 + 1
+
+
+def plan_batches(contexts: Dict[str, str], token_budget: int = BATCH_TOKEN_BUDGET) -> List[List[str]]:
+    """
+    Group buildings into batches whose prompt and expected output fit within a token budget.
+    The shared preamble is counted once per batch.
+
+    Args:
+        contexts (Dict[str, str]): Serialized context for each building name.
+        token_budget (int, optional): Token budget per batch. Defaults to BATCH_TOKEN_BUDGET.
+
+    Returns:
+        List[List[str]]: Building names in each batch. A building that alone exceeds the budget gets its own batch.
+    """
+    preamble_tokens = estimate_tokens(FIRST_PROMPT + BATCH_PROMPT)
+    batches = []
+    batch, batch_tokens = [], preamble_tokens
+
+    for building_name, context in contexts.items():
+        tokens = estimate_tokens(context) + OUTPUT_TOKENS_PER_BUILDING
+        if batch and batch_tokens + tokens > token_budget:
+            batches.append(batch)
+            batch, batch_tokens = [], preamble_tokens
+        batch.append(building_name)
+        batch_tokens += tokens
+
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def build_batch_prompt(contexts: Dict[str, str], building_names: List[str]) -> str:
+    """
+    Build a single prompt asking for an action plan for each of the given buildings.
+    """
+    sections = [f"### BUILDING: {name}\n{contexts[name]}" for name in building_names]
+    return "\n\n".join([FIRST_PROMPT, BATCH_PROMPT, *sections])
+
+
+def split_batch_response(response: str, building_names: List[str]) -> Dict[str, dict]:
+    """
+    Split a batched response back into per-building action plans.
+
+    Args:
+        response (str): The AI response containing one section per building.
+        building_names (List[str]): The buildings that were requested.
+
+    Returns:
+        Dict[str, dict]: The parsed action plan for each requested building that has a valid section.
+    """
+    matches = list(BUILDING_SECTION.finditer(response))
+    plans = {}
+
+    for i, match in enumerate(matches):
+        building_name = match.group(1)
+        if building_name not in building_names or building_name in plans:
+            continue
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(response)
+        try:
+            plans[building_name] = parseGeneratedResponseForJson(response[match.end():end])
+        except Exception:
+            continue
+
+    return plans
+
+
+def generate_plans(user_id: str, building_names: List[str], token_budget: int = BATCH_TOKEN_BUDGET) -> Tuple[Dict[str, dict], Dict[str, ClientError]]:
+    """
+    Returns action plans for several buildings. Precomputed and cached plans are used first,
+    the rest are generated by packing as many buildings as the token budget allows into each
+    AI request. Generated plans are cached per building.
+
+    Args:
+        user_id (str): The user ID.
+        building_names (List[str]): The buildings to get action plans for.
+        token_budget (int, optional): Token budget per AI request. Defaults to BATCH_TOKEN_BUDGET.
+
+    Returns:
+        Tuple[Dict[str, dict], Dict[str, ClientError]]: The action plan for each building that has one,
+            and the error for each building that does not.
+
+    Raises:
+        OverloadedError: If an AI request was not admitted. Earlier batches are still cached.
+    """
+    results = {}
+    contexts = {}
+    errors = {}
+    uncached = []
+
+    for building_name in building_names:
+        if building_name in PRECOMPUTED_BUILDINGS:
+            results[building_name] = get_cached_data(user_id, building_name)
+            continue
+
+        with _plan_lock:
+            entry = _plan_cache.get(building_key(user_id, building_name))
+        if entry is not None:
+            results[building_name] = entry["plan"]
+            continue
+        uncached.append(building_name)
+
+    # Shed rate limited and overloaded requests before fetching weather and usage for them
+    if uncached:
+        generate_admission.check(user_id)
+
+    for building_name in uncached:
+        try:
+            contexts[building_name] = json.dumps(get_building_context(user_id, building_name))
+        except ClientError as e:
+            errors[building_name] = e
+
+    for batch in plan_batches(contexts, token_budget):
+        with generate_admission.admit(user_id):
+            response = promptAI(build_batch_prompt(contexts, batch))
+        if response.startswith("Error:"):
+            for building_name in batch:
+                errors[building_name] = ClientError(response, 502)
+            continue
+
+        plans = split_batch_response(response, batch)
+        generated_at = time.time()
+        for building_name in batch:
+            if building_name not in plans:
+                errors[building_name] = ClientError("AI did not include valid JSON", 502)
+                continue
+            with _plan_lock:
+                _plan_cache[building_key(user_id, building_name)] = {"plan": plans[building_name], "generated_at": generated_at}
+            results[building_name] = plans[building_name]
+
+    return results, errors
+
+
+def get_generated_data_batch(user_id: str, building_names: List[str], token_budget: int = BATCH_TOKEN_BUDGET) -> Dict[str, dict]:
+    """
+    Returns action plans for several buildings, see generate_plans.
+
+    Raises:
+        ClientError: If a plan could not be made for any building. Plans generated for the other
+            buildings are still cached, so a retry only regenerates the failed ones.
+        OverloadedError: If an AI request was not admitted.
+    """
+    results, errors = generate_plans(user_id, building_names, token_budget)
+    if errors:
+        codes = {e.code for e in errors.values()}
+        message = "; ".join(f"{building_name}: {e.message}" for building_name, e in errors.items())
+        raise ClientError(message, codes.pop() if len(codes) == 1 else 502)
+
+    return results
+
+
 def get_generated_data(user_id: str, building_name: str) -> dict:
-    try:
-        print("2"+building_name)
-        get_cached_data(user_id, building_name)
-    except Exception as e:
-        print("New, use AI")
-        promptAI(FIRST_PROMPT+building_name)
+    """
+    Returns the action plan for a building, from the precomputed data if available,
+    otherwise from the plan cache or generated by the AI.
+    """
+    return get_generated_data_batch(user_id, [building_name])[building_name]
+
+
+def get_portfolio_generated_data(user_id: str) -> dict:
+    """
+    Returns the action plans for all of the user's buildings, generating uncached ones in batches.
+    A building that fails does not hold back the others, its error is returned alongside the plans.
+
+    Only buildings in BUILDING_LOCATIONS can be generated, as office documents store no timezone
+    for the weather lookup. Other offices are reported in errors with a 404.
+
+    Returns:
+        dict: plans maps building names to action plans, errors maps building names to a message and code.
+    """
+    plans, errors = generate_plans(user_id, get_building_names(user_id))
+    return {
+        "plans": plans,
+        "errors": {building_name: {"message": e.message, "code": e.code} for building_name, e in errors.items()}
+    }
 
 
 def get_building_data(user_id: str, building_name: str) -> dict:
     """
     Fetches and returns weather and location data for a specified user and building.
+
+    Raises:
+        ClientError: 404 if the building is unknown, 502 if the weather or location could not be fetched.
     """
-    try:
-        # Sample latitude, longitude, and timezone for the building
-        # Replace these with actual logic for fetching building details
-        building_data = {
-            "Dubai Office": {"latitude": 25.27, "longitude": 55.29, "timezone": "Asia/Dubai"},
-            "Dallas Office": {"latitude": 32.77, "longitude": -96.79, "timezone": "America/Chicago"}
-        }
-        
-        if building_name not in building_data:
-            raise ValueError(f"Building {building_name} not found.")
+    if building_name not in BUILDING_LOCATIONS:
+        raise ClientError(f"Building {building_name} not found.", 404)
 
+    try:
         # Get building-specific data
-        data = building_data[building_name]
+        data = BUILDING_LOCATIONS[building_name]
         latitude = data["latitude"]
         longitude = data["longitude"]
         timezone = data["timezone"]
@@ -182,4 +436,96 @@ def get_building_data(user_id: str, building_name: str) -> dict:
 
     except Exception as e:
         print(f"Error: {e}")
-        return {"error": str(e)}
+        raise ClientError(f"Error fetching building data: {e}", 502)
+
+
+def get_building_context(user_id: str, building_name: str) -> dict:
+    """
+    Returns the building data and the upcoming hourly forecast, as context for generating an action plan.
+
+    Raises:
+        ClientError: 404 if the building is unknown, 502 if the weather or location could not be fetched.
+    """
+    context = get_building_data(user_id, building_name)
+    location = BUILDING_LOCATIONS[building_name]
+
+    try:
+        forecast = fetch_hourly_weather_data(location["latitude"], location["longitude"], location["timezone"])
+    except Exception as e:
+        raise ClientError(f"Error fetching forecast: {e}", 502)
+
+    upcoming = forecast[forecast["time"] >= pd.Timestamp.now(tz="UTC").floor("h")].head(FORECAST_HOURS)
+    context["forecast"] = [
+        {
+            "time": hour.tz_convert(location["timezone"]).strftime("%a %H:%M"),
+            "temperature": round(float(temperature)),
+            "rain": round(float(rain), 2)
+        }
+        for hour, temperature, rain in zip(upcoming["time"], upcoming["temperature_2m"], upcoming["rain"])
+    ]
+    return context
+
+
+def ingest_energy_usage(user_id: str, building_name: str, timestamp: datetime, energy_usage_kWh: float) -> Optional[dict]:
+    """
+    Stores an energy usage reading and scores it against the building's rolling baseline.
+
+    Args:
+        user_id (str): The user ID.
+        building_name (str): The building name.
+        timestamp (datetime): Time of the reading.
+        energy_usage_kWh (float): Energy used in kWh.
+
+    Returns:
+        Optional[dict]: The anomaly alert raised by the reading, if any.
+    """
+    add_energy_usage(user_id, building_name, timestamp, energy_usage_kWh)
+    store_late_energy_usage(user_id, building_name, timestamp, energy_usage_kWh)
+    return detector.update(building_key(user_id, building_name), timestamp, energy_usage_kWh)
+
+
+def get_anomalies(user_id: str, building_name: str) -> List[dict]:
+    """
+    Returns the recent energy usage anomalies for a building, newest first.
+    """
+    return detector.alerts(building_key(user_id, building_name))
+
+
+def get_energy_usage_history(user_id: str, building_name: str, start: Optional[datetime] = None,
+                             end: Optional[datetime] = None, bucket: Optional[int] = None, how: str = 'sum') -> dict:
+    """
+    Returns a building's energy usage history from the local series store, after syncing new readings from Firestore.
+
+    Args:
+        user_id (str): The user ID.
+        building_name (str): The building name.
+        start (Optional[datetime], optional): Start of the range, inclusive. Defaults to the first reading.
+        end (Optional[datetime], optional): End of the range, exclusive. Defaults to after the last reading.
+        bucket (Optional[int], optional): Bucket width in seconds to roll readings up into. Defaults to raw readings.
+        how (str, optional): Aggregate used for each bucket, one of sum, mean, min or max. Defaults to sum.
+
+    Returns:
+        dict: UNIX timestamps in seconds, energy usage in kWh for each, and the aggregate over the whole range.
+    """
+    sync_energy_usage(user_id, building_name)
+    store = get_series_store()
+    key = building_key(user_id, building_name)
+    start_ts = int(start.timestamp()) if start else None
+    end_ts = int(end.timestamp()) if end else None
+
+    if bucket is not None:
+        if bucket <= 0:
+            raise ClientError("Bucket width must be positive")
+        timestamps, values = store.range(key, start_ts, end_ts)
+        if len(timestamps):
+            first = start_ts if start_ts is not None else int(timestamps[0]) - int(timestamps[0]) % bucket
+            last = end_ts if end_ts is not None else int(timestamps[-1]) + 1
+            timestamps, values = store.rollup(key, first, last, bucket, how)
+    else:
+        timestamps, values = store.range(key, start_ts, end_ts)
+
+    return {
+        "timestamps": timestamps.tolist(),
+        "energy_usage_kWh": values.tolist(),
+        how: store.aggregate(key, start_ts, end_ts, how),
+    }
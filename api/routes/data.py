@@ -1,7 +1,11 @@
-from flask import Blueprint, jsonify, g
-from wrappers import verify_token
-from main.data import get_generated_data, get_building_data
-from exceptions import ClientError
+import math
+from datetime import datetime, timezone
+from flask import Blueprint, jsonify, g, request
+from wrappers import verify_token, conditional_response
+from main.data import get_generated_data, get_building_data, get_generated_version, get_building_version
+from main.data import ingest_energy_usage, get_anomalies, get_portfolio_generated_data, get_energy_usage_history
+from main.data import generate_admission
+from exceptions import ClientError, OverloadedError
 from main.data import promptAI
 
 # Define the Blueprint
@@ -9,6 +13,7 @@ data_bp = Blueprint('data_bp', __name__)
 
 @data_bp.route('/data/generate/<building_name>', methods=['GET'])
 @verify_token
+@conditional_response(get_generated_version)
 def generate_data(building_name):
     """
     Generate data for the authenticated user based on the building name.
@@ -21,6 +26,9 @@ def generate_data(building_name):
         
         # Assuming the function returns data that you want to jsonify
         return jsonify(data), 200
+
+    except OverloadedError as e:
+        return jsonify({'message': e.message}), e.code, {'Retry-After': str(e.retry_after)}
     
     except ClientError as e:
         return jsonify({'message': e.message}), e.code
@@ -29,8 +37,43 @@ def generate_data(building_name):
         return jsonify({'message': str(e)}), 500
 
 
+@data_bp.route('/data/generate', methods=['GET'])
+@verify_token
+def generate_portfolio_data():
+    """
+    Generate data for all of the authenticated user's buildings, batching buildings into shared AI requests.
+    """
+    try:
+        data = get_portfolio_generated_data(user_id=g.user_id)
+
+        return jsonify(data), 200
+
+    except OverloadedError as e:
+        return jsonify({'message': e.message}), e.code, {'Retry-After': str(e.retry_after)}
+
+    except ClientError as e:
+        return jsonify({'message': e.message}), e.code
+
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+
+@data_bp.route('/data/admission', methods=['GET'])
+@verify_token
+def admission_stats():
+    """
+    Retrieve the queue depth and shed counts of the AI requests.
+    Only available to users with the admin custom claim.
+    """
+    if not g.user.get('admin'):
+        return jsonify({'message': 'Admin access required'}), 403
+
+    return jsonify(generate_admission.stats()), 200
+
+
 @data_bp.route('/data/building/<building_name>', methods=['GET'])
 @verify_token
+@conditional_response(get_building_version)
 def user_data(building_name):
     """
     Retrieve data for the authenticated user's bulding.
@@ -46,3 +89,88 @@ def user_data(building_name):
 
     except Exception as e:
         return jsonify({'message': str(e)}), 500
+
+
+@data_bp.route('/data/energy/<building_name>', methods=['POST'])
+@verify_token
+def add_energy_usage(building_name):
+    """
+    Store an energy usage reading for the authenticated user's building and score it for anomalies.
+    Expects JSON with energy_usage_kWh and an optional ISO-formatted timestamp, UTC if it has no offset.
+    """
+    try:
+        body = request.get_json(silent=True) or {}
+        if 'energy_usage_kWh' not in body:
+            raise ClientError("Missing required field: energy_usage_kWh")
+
+        try:
+            energy_usage_kWh = float(body['energy_usage_kWh'])
+            timestamp = datetime.fromisoformat(body['timestamp']) if 'timestamp' in body else datetime.now(timezone.utc)
+        except (TypeError, ValueError) as e:
+            raise ClientError(f"Invalid energy usage reading: {e}", 422)
+
+        if not math.isfinite(energy_usage_kWh):
+            raise ClientError("Invalid energy usage reading: energy_usage_kWh must be a finite number", 422)
+
+        # Timestamps without an offset are taken as UTC
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+
+        anomaly = ingest_energy_usage(g.user_id, building_name, timestamp, energy_usage_kWh)
+
+        return jsonify({'anomaly': anomaly}), 201
+
+    except ClientError as e:
+        return jsonify({'message': e.message}), e.code
+
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+
+@data_bp.route('/data/energy/<building_name>', methods=['GET'])
+@verify_token
+def energy_usage_history(building_name):
+    """
+    Retrieve energy usage history for the authenticated user's building.
+    Optional query parameters: ISO-formatted start and end, bucket width in seconds,
+    and how (sum, mean, min or max) to aggregate each bucket.
+    """
+    try:
+        try:
+            start = datetime.fromisoformat(request.args['start']) if 'start' in request.args else None
+            end = datetime.fromisoformat(request.args['end']) if 'end' in request.args else None
+            bucket = int(request.args['bucket']) if 'bucket' in request.args else None
+        except ValueError as e:
+            raise ClientError(f"Invalid query parameter: {e}", 422)
+
+        # Times without an offset are taken as UTC, like the readings themselves
+        if start is not None and start.tzinfo is None:
+            start = start.replace(tzinfo=timezone.utc)
+        if end is not None and end.tzinfo is None:
+            end = end.replace(tzinfo=timezone.utc)
+
+        data = get_energy_usage_history(g.user_id, building_name, start, end, bucket, request.args.get('how', 'sum'))
+
+        return jsonify(data), 200
+
+    except ClientError as e:
+        return jsonify({'message': e.message}), e.code
+
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+
+@data_bp.route('/data/anomalies/<building_name>', methods=['GET'])
+@verify_token
+def anomalies(building_name):
+    """
+    Retrieve recent energy usage anomalies for the authenticated user's building.
+    """
+    try:
+        return jsonify(get_anomalies(g.user_id, building_name)), 200
+
+    except ClientError as e:
+        return jsonify({'message': e.message}), e.code
+
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
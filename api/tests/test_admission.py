@@ -0,0 +1,131 @@
+import threading
+import time
+import pytest
+from admission import AdmissionController
+from exceptions import OverloadedError
+
+
+def occupy(controller: AdmissionController, user_id: str, release: threading.Event) -> threading.Thread:
+    """Hold a slot in a background thread until release is set."""
+    admitted = threading.Event()
+
+    def run():
+        with controller.admit(user_id):
+            admitted.set()
+            release.wait()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    admitted.wait(1)
+    return thread
+
+
+class TestAdmissionController:
+    def test_admits_up_to_concurrency_cap(self):
+        controller = AdmissionController(max_concurrent=2, rate=100, burst=100)
+        release = threading.Event()
+        threads = [occupy(controller, f"user{i}", release) for i in range(2)]
+
+        assert controller.stats()["active"] == 2
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert controller.stats()["active"] == 0
+        assert controller.stats()["admitted"] == 2
+
+    def test_sheds_when_queue_is_full(self):
+        controller = AdmissionController(max_concurrent=1, max_queue=0, rate=100, burst=100)
+        release = threading.Event()
+        thread = occupy(controller, "a", release)
+
+        with pytest.raises(OverloadedError) as e:
+            controller.acquire("b")
+
+        assert e.value.code == 503
+        assert e.value.retry_after >= 1
+        assert controller.stats()["queue_full"] == 1
+        release.set()
+        thread.join()
+
+    def test_queued_request_times_out(self):
+        controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=0.1, rate=100, burst=100)
+        release = threading.Event()
+        thread = occupy(controller, "a", release)
+
+        start = time.monotonic()
+        with pytest.raises(OverloadedError) as e:
+            controller.acquire("b")
+
+        assert e.value.code == 503
+        assert time.monotonic() - start < 1
+        assert controller.stats()["timed_out"] == 1
+        assert controller.stats()["queued"] == 0
+        release.set()
+        thread.join()
+
+    def test_queued_request_is_admitted_when_slot_frees(self):
+        controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=2, rate=100, burst=100)
+        release = threading.Event()
+        thread = occupy(controller, "a", release)
+
+        threading.Timer(0.1, release.set).start()
+        controller.acquire("b")
+
+        assert controller.stats()["active"] == 1
+        controller.release()
+        thread.join()
+
+    def test_rate_limits_per_user(self):
+        controller = AdmissionController(rate=0.1, burst=2)
+        for _ in range(2):
+            with controller.admit("a"):
+                pass
+
+        with pytest.raises(OverloadedError) as e:
+            controller.acquire("a")
+
+        assert e.value.code == 429
+        assert e.value.retry_after == 10
+        assert controller.stats()["rate_limited"] == 1
+        # Other users have their own bucket
+        with controller.admit("b"):
+            pass
+
+    def test_shed_requests_keep_their_token(self):
+        controller = AdmissionController(max_concurrent=1, max_queue=0, rate=0.001, burst=1)
+        release = threading.Event()
+        thread = occupy(controller, "a", release)
+
+        with pytest.raises(OverloadedError):
+            controller.acquire("b")
+        release.set()
+        thread.join()
+
+        with controller.admit("b"):
+            pass
+
+    def test_check_consumes_nothing(self):
+        controller = AdmissionController(rate=0.001, burst=1)
+        controller.check("a")
+        controller.check("a")
+
+        with controller.admit("a"):
+            pass
+        with pytest.raises(OverloadedError) as e:
+            controller.check("a")
+
+        assert e.value.code == 429
+        assert controller.stats()["admitted"] == 1
+
+    def test_check_sheds_when_queue_is_full(self):
+        controller = AdmissionController(max_concurrent=1, max_queue=0, rate=100, burst=100)
+        release = threading.Event()
+        thread = occupy(controller, "a", release)
+
+        with pytest.raises(OverloadedError) as e:
+            controller.check("b")
+
+        assert e.value.code == 503
+        release.set()
+        thread.join()
+        controller.check("b")
@@ -0,0 +1,80 @@
+import math
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pytest
+from main.anomaly import AnomalyDetector
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def usage(timestamp: datetime, rng: np.random.Generator) -> float:
+    """Simulated daily cycle with a little noise."""
+    return 100 + 50 * math.sin(timestamp.hour / 24 * 2 * math.pi) + rng.normal(0, 2)
+
+
+def feed(detector: AnomalyDetector, key: str, hours: int, seed: int = 0):
+    """Feed hourly readings starting at START, returning the alerts raised."""
+    rng = np.random.default_rng(seed)
+    alerts = []
+    for i in range(hours):
+        timestamp = START + timedelta(hours=i)
+        alert = detector.update(key, timestamp, usage(timestamp, rng))
+        if alert:
+            alerts.append(alert)
+    return alerts
+
+
+class TestAnomalyDetector:
+    def test_no_alerts_during_warmup(self):
+        detector = AnomalyDetector(warmup=24)
+        feed(detector, "b", 5)
+        assert detector.update("b", START + timedelta(hours=5), 10000) is None
+
+    def test_spike_after_warmup_alerts(self):
+        detector = AnomalyDetector()
+        feed(detector, "b", 24 * 7)
+        timestamp = START + timedelta(days=7, hours=3)
+
+        alert = detector.update("b", timestamp, 1000)
+
+        assert alert is not None
+        assert alert["score"] > detector.threshold
+        assert alert["timestamp"] == timestamp.isoformat()
+        assert detector.alerts("b")[0] == alert
+
+    def test_normal_reading_after_warmup_does_not_alert(self):
+        detector = AnomalyDetector()
+        feed(detector, "b", 24 * 7)
+        timestamp = START + timedelta(days=7, hours=3)
+
+        assert detector.update("b", timestamp, usage(timestamp, np.random.default_rng(1))) is None
+
+    def test_buildings_are_independent(self):
+        detector = AnomalyDetector(capacity=1)
+        feed(detector, "a", 24 * 7)
+        feed(detector, "b", 24 * 7)
+
+        detector.update("b", START + timedelta(days=7), 1000)
+
+        assert detector.alerts("a") == []
+        assert len(detector.alerts("b")) == 1
+
+    def test_offsets_and_naive_timestamps_share_utc_hour(self):
+        detector = AnomalyDetector()
+        dallas = timezone(timedelta(hours=-6))
+        detector.update("b", datetime(2026, 1, 1, 9, tzinfo=dallas), 100)
+        detector.update("b", datetime(2026, 1, 2, 15), 100)
+        detector.update("b", datetime(2026, 1, 3, 15, tzinfo=timezone.utc), 100)
+
+        slot = detector._index["b"]
+        assert detector._hour_count[slot, 15] == 3
+
+    @pytest.mark.parametrize("value", [float("nan"), float("inf"), float("-inf")])
+    def test_non_finite_reading_is_rejected(self, value):
+        detector = AnomalyDetector()
+        feed(detector, "b", 24 * 7)
+
+        with pytest.raises(ValueError):
+            detector.update("b", START + timedelta(days=7), value)
+
+        assert detector.update("b", START + timedelta(days=7, hours=1), 10000) is not None
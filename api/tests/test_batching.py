@@ -0,0 +1,139 @@
+import pytest
+from cachetools import TTLCache
+import main.data as data
+from admission import AdmissionController
+from exceptions import ClientError, OverloadedError
+from database.data import building_key
+from main.data import plan_batches, split_batch_response, build_batch_prompt, estimate_tokens, OUTPUT_TOKENS_PER_BUILDING
+
+
+class TestPlanBatches:
+    def test_small_contexts_share_one_batch(self):
+        contexts = {f"Office {i}": "{}" for i in range(3)}
+        assert plan_batches(contexts, token_budget=100000) == [["Office 0", "Office 1", "Office 2"]]
+
+    def test_batches_respect_budget(self):
+        contexts = {f"Office {i}": "x" * 4000 for i in range(5)}
+        per_building = estimate_tokens("x" * 4000) + OUTPUT_TOKENS_PER_BUILDING
+        budget = estimate_tokens(build_batch_prompt({}, [])) + 2 * per_building
+
+        batches = plan_batches(contexts, token_budget=budget)
+
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+        assert [name for batch in batches for name in batch] == list(contexts)
+
+    def test_oversized_building_gets_own_batch(self):
+        contexts = {"Small": "{}", "Huge": "x" * 100000, "Other": "{}"}
+        assert plan_batches(contexts, token_budget=5000) == [["Small"], ["Huge"], ["Other"]]
+
+    def test_no_contexts(self):
+        assert plan_batches({}) == []
+
+
+class TestSplitBatchResponse:
+    def test_splits_sections(self):
+        response = (
+            "Here are the plans.\n"
+            "### BUILDING: Austin Office\n{\"actions\": [1]}\n"
+            "### BUILDING: Paris Office\n```json\n{\"actions\": [2]}\n```\n"
+        )
+        plans = split_batch_response(response, ["Austin Office", "Paris Office"])
+        assert plans == {"Austin Office": {"actions": [1]}, "Paris Office": {"actions": [2]}}
+
+    def test_out_of_order_sections(self):
+        response = "## BUILDING: B\n{\"id\": \"b\"}\n## BUILDING: A\n{\"id\": \"a\"}"
+        assert split_batch_response(response, ["A", "B"]) == {"A": {"id": "a"}, "B": {"id": "b"}}
+
+    def test_missing_and_invalid_sections_are_left_out(self):
+        response = "### BUILDING: A\n{\"id\": \"a\"}\n### BUILDING: B\nno json here"
+        assert split_batch_response(response, ["A", "B", "C"]) == {"A": {"id": "a"}}
+
+    def test_unrequested_and_duplicate_sections_are_ignored(self):
+        response = (
+            "### BUILDING: A\n{\"id\": 1}\n"
+            "### BUILDING: Z\n{\"id\": 2}\n"
+            "### BUILDING: A\n{\"id\": 3}"
+        )
+        assert split_batch_response(response, ["A"]) == {"A": {"id": 1}}
+
+    def test_error_response(self):
+        assert split_batch_response("Error: API request failed with status code 429", ["A"]) == {}
+
+
+class TestGeneratedDataBatch:
+    @pytest.fixture(autouse=True)
+    def fake_ai(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(data, "_plan_cache", TTLCache(maxsize=16, ttl=60))
+        monkeypatch.setattr(data, "get_building_context", lambda user_id, name: {"name": name})
+        monkeypatch.setattr(data, "generate_admission", AdmissionController(max_concurrent=1, rate=100, burst=100))
+        monkeypatch.setattr(data, "promptAI", lambda prompt: calls.append(prompt) or self.response)
+        self.response = ""
+        return calls
+
+    def test_precomputed_and_cached_plans_skip_the_ai(self, fake_ai):
+        data._plan_cache[building_key("user", "Austin Office")] = {"plan": {"id": "cached"}, "generated_at": 0}
+
+        plans = data.get_generated_data_batch("user", ["Dallas Office", "Austin Office"])
+
+        assert plans["Austin Office"] == {"id": "cached"}
+        assert plans["Dallas Office"] == data.get_cached_data("user", "Dallas Office")
+        assert fake_ai == []
+        assert data.generate_admission.stats()["admitted"] == 0
+
+    def test_generated_plans_are_cached(self, fake_ai):
+        self.response = "### BUILDING: Austin Office\n{\"id\": \"a\"}"
+
+        assert data.get_generated_data("user", "Austin Office") == {"id": "a"}
+        assert data.get_generated_data("user", "Austin Office") == {"id": "a"}
+        assert len(fake_ai) == 1
+        assert data.get_generated_version("user", "Austin Office") is not None
+
+    def test_ai_error_is_raised(self, fake_ai):
+        self.response = "Error: API request failed with status code 429"
+
+        with pytest.raises(ClientError) as e:
+            data.get_generated_data("user", "Austin Office")
+
+        assert e.value.code == 502
+        assert "status code 429" in e.value.message
+        assert data.get_generated_version("user", "Austin Office") is None
+
+    def test_missing_section_fails_only_that_building(self, fake_ai):
+        self.response = "### BUILDING: Austin Office\n{\"id\": \"a\"}"
+
+        with pytest.raises(ClientError) as e:
+            data.get_generated_data_batch("user", ["Austin Office", "Paris Office"])
+
+        assert "Paris Office" in e.value.message
+        assert "Austin Office" not in e.value.message
+        assert data.get_generated_data("user", "Austin Office") == {"id": "a"}
+        assert len(fake_ai) == 1
+
+    def test_rate_limited_request_builds_no_context(self, fake_ai, monkeypatch):
+        contexts = []
+        monkeypatch.setattr(data, "get_building_context", lambda user_id, name: contexts.append(name) or {"name": name})
+        monkeypatch.setattr(data, "generate_admission", AdmissionController(rate=0.001, burst=1))
+        self.response = "### BUILDING: Austin Office\n{\"id\": \"a\"}"
+        data.get_generated_data("user", "Austin Office")
+
+        with pytest.raises(OverloadedError) as e:
+            data.get_generated_data("user", "Paris Office")
+
+        assert e.value.code == 429
+        assert contexts == ["Austin Office"]
+        assert len(fake_ai) == 1
+
+    def test_portfolio_reports_failures_per_building(self, fake_ai, monkeypatch):
+        def context(user_id, name):
+            if name == "Paris Office":
+                raise ClientError("Unknown location for building Paris Office", 404)
+            return {"name": name}
+        monkeypatch.setattr(data, "get_building_context", context)
+        monkeypatch.setattr(data, "get_building_names", lambda user_id: ["Austin Office", "Paris Office"])
+        self.response = "### BUILDING: Austin Office\n{\"id\": \"a\"}"
+
+        portfolio = data.get_portfolio_generated_data("user")
+
+        assert portfolio["plans"] == {"Austin Office": {"id": "a"}}
+        assert portfolio["errors"]["Paris Office"]["code"] == 404
@@ -0,0 +1,114 @@
+import ast
+import importlib.util
+import json
+import os
+import pytest
+
+# docs/generate.py is a script rather than a package module, so load it from its path
+GENERATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "docs", "generate.py")
+spec = importlib.util.spec_from_file_location("generate", GENERATE_PATH)
+generate = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(generate)
+
+SOURCE = '''
+def outer(x: int) -> int:
+    """Outer function."""
+    def inner():
+        """Nested, not documented."""
+    return x
+
+
+class Store:
+    def get(self, key: str):
+        """Get a value."""
+'''
+
+
+class InlineExecutor:
+    """Runs the process pool work in-process and records which files were parsed."""
+
+    parsed = []
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def map(self, fn, paths):
+        InlineExecutor.parsed.extend(paths)
+        return map(fn, paths)
+
+
+@pytest.fixture
+def parsed(monkeypatch):
+    InlineExecutor.parsed = []
+    monkeypatch.setattr(generate, "ProcessPoolExecutor", InlineExecutor)
+    return InlineExecutor.parsed
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("api")
+    with open("api/store.py", "w") as f:
+        f.write(SOURCE)
+    with open("api/other.py", "w") as f:
+        f.write('def helper():\n    """Help."""\n')
+    return tmp_path
+
+
+def run():
+    generate.generate_functions_documentation(["api"], "backend.md", "cache.json")
+    with open("backend.md") as f:
+        return f.read()
+
+
+class TestIterDocumentedFunctions:
+    def test_skips_nested_functions_and_qualifies_methods(self):
+        tree = ast.parse(SOURCE)
+        names = [prefix + node.name for prefix, node in generate.iter_documented_functions(tree.body)]
+        assert names == ["outer", "Store.get"]
+
+
+class TestGenerateFunctionsDocumentation:
+    def test_documents_module_functions_and_methods(self, project, parsed):
+        output = run()
+
+        assert "`api.store.outer(x: int) -> int`" in output
+        assert "`api.store.Store.get(self, key: str)`" in output
+        assert "inner" not in output
+
+    def test_unchanged_files_are_not_parsed_again(self, project, parsed):
+        first = run()
+        parsed.clear()
+
+        assert run() == first
+        assert parsed == []
+
+    def test_edited_file_is_parsed_again(self, project, parsed):
+        run()
+        parsed.clear()
+        with open("api/other.py", "w") as f:
+            f.write('def renamed():\n    """Help."""\n')
+
+        output = run()
+
+        assert parsed == [os.path.join("api", "other.py")]
+        assert "renamed()" in output
+        assert "helper()" not in output
+
+    def test_deleted_file_is_dropped_from_cache(self, project, parsed):
+        run()
+        os.remove("api/other.py")
+
+        output = run()
+
+        with open("cache.json") as f:
+            cache = json.load(f)
+        assert os.path.join("api", "other.py") not in cache
+        assert os.path.join("api", "store.py") in cache
+        assert "helper()" not in output
@@ -0,0 +1,158 @@
+from datetime import datetime, timezone
+import numpy as np
+import pytest
+import database.series as series
+from database.series import SeriesStore, store_late_energy_usage
+from database.data import building_key
+from exceptions import ClientError
+
+START = 1767225600  # 2026-01-01 00:00 UTC
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SeriesStore(str(tmp_path))
+
+
+def minutes(count: int, offset: int = 0) -> np.ndarray:
+    return START + (np.arange(count) + offset) * 60
+
+
+class TestSeriesStore:
+    def test_append_and_read_back(self, store):
+        assert store.append("b", minutes(3), [1.0, 2.0, 3.0]) == 3
+        assert store.append("b", minutes(2, 3), [4.0, 5.0]) == 2
+
+        timestamps, values = store.series("b")
+
+        assert timestamps.tolist() == minutes(5).tolist()
+        assert values.tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+        assert store.last_timestamp("b") == minutes(5)[-1]
+
+    def test_missing_series_is_empty(self, store):
+        timestamps, values = store.range("missing")
+        assert len(timestamps) == 0 and len(values) == 0
+        assert store.aggregate("missing") is None
+
+    def test_rejects_unsorted_input(self, store):
+        with pytest.raises(ClientError):
+            store.append("b", [START + 60, START], [1.0, 2.0])
+
+    def test_range_is_half_open_view(self, store):
+        store.append("b", minutes(10), np.arange(10, dtype=float))
+
+        timestamps, values = store.range("b", START + 2 * 60, START + 5 * 60)
+
+        assert values.tolist() == [2.0, 3.0, 4.0]
+        assert np.shares_memory(values, store.series("b")[1])
+
+    def test_aggregate(self, store):
+        store.append("b", minutes(4), [1.0, 2.0, 3.0, 6.0])
+        assert store.aggregate("b", how="sum") == 12.0
+        assert store.aggregate("b", how="mean") == 3.0
+        assert store.aggregate("b", START + 60, how="min") == 2.0
+        with pytest.raises(ClientError):
+            store.aggregate("b", how="median")
+
+    def test_rollup_skips_empty_buckets(self, store):
+        store.append("b", [START, START + 60, START + 7200, START + 7260], [1.0, 2.0, 3.0, 5.0])
+
+        starts, sums = store.rollup("b", START, START + 3 * 3600, 3600)
+        assert starts.tolist() == [START, START + 7200]
+        assert sums.tolist() == [3.0, 8.0]
+
+        _, means = store.rollup("b", START, START + 3 * 3600, 3600, how="mean")
+        assert means.tolist() == [1.5, 4.0]
+
+    def test_rollup_rejects_empty_bucket_width(self, store):
+        with pytest.raises(ClientError):
+            store.rollup("b", START, START + 60, 0)
+
+    def test_late_readings_are_merged(self, store):
+        store.append("b", [START, START + 120, START + 240], [1.0, 3.0, 5.0])
+        old_timestamps, old_values = store.series("b")
+
+        assert store.append("b", [START + 60, START + 120, START + 300], [2.0, 30.0, 6.0]) == 2
+
+        timestamps, values = store.series("b")
+        assert timestamps.tolist() == [START, START + 60, START + 120, START + 240, START + 300]
+        assert values.tolist() == [1.0, 2.0, 30.0, 5.0, 6.0]
+        # Arrays handed out before the merge are unchanged
+        assert old_values.tolist() == [1.0, 3.0, 5.0]
+
+    def test_keys_do_not_collide(self, store):
+        store.append("u/Dallas Office", [START], [1.0])
+        store.append("u/Dallas_Office", [START], [2.0])
+        store.append("u/..", [START], [3.0])
+
+        assert store.series("u/Dallas Office")[1].tolist() == [1.0]
+        assert store.series("u/Dallas_Office")[1].tolist() == [2.0]
+        assert store.series("u/..")[1].tolist() == [3.0]
+
+    def test_reopened_store_reads_same_data(self, store):
+        store.append("b", minutes(3), [1.0, 2.0, 3.0])
+        assert SeriesStore(store.root).series("b")[1].tolist() == [1.0, 2.0, 3.0]
+
+
+class TestStoreLateEnergyUsage:
+    def test_late_reading_is_stored(self, store):
+        store.append(building_key("u", "b"), [START + 3600], [1.0])
+
+        late = datetime.fromtimestamp(START, timezone.utc)
+        assert store_late_energy_usage("u", "b", late, 5.0, store)
+        assert store.series(building_key("u", "b"))[1].tolist() == [5.0, 1.0]
+
+    def test_new_reading_is_left_to_sync(self, store):
+        store.append(building_key("u", "b"), [START], [1.0])
+
+        new = datetime.fromtimestamp(START + 60, timezone.utc)
+        assert not store_late_energy_usage("u", "b", new, 5.0, store)
+        assert store.series(building_key("u", "b"))[1].tolist() == [1.0]
+
+
+class FakeQuery:
+    """Just enough of a Firestore energy_usage query for sync_energy_usage."""
+
+    def __init__(self, readings):
+        self.readings = readings
+
+    def collection(self, name):
+        return self
+
+    def document(self, name):
+        return self
+
+    def order_by(self, field):
+        return FakeQuery(sorted(self.readings, key=lambda reading: reading['timestamp']))
+
+    def where(self, field, op, value):
+        compare = {'>': lambda a, b: a > b, '>=': lambda a, b: a >= b}[op]
+        return FakeQuery([reading for reading in self.readings if compare(reading[field], value)])
+
+    def stream(self):
+        return [type('Snapshot', (), {'to_dict': lambda self, reading=reading: reading})() for reading in self.readings]
+
+
+class TestSyncEnergyUsage:
+    @pytest.fixture
+    def readings(self, monkeypatch):
+        readings = []
+        monkeypatch.setattr(series, "get_building_id", lambda user_id, building_name: "office")
+        monkeypatch.setattr(series.firestore, "Client", lambda: FakeQuery(readings))
+        return readings
+
+    def test_resync_with_sub_second_timestamp_is_a_no_op(self, store, readings):
+        readings.append({'timestamp': datetime.fromtimestamp(START + 0.5, timezone.utc), 'energy_usage_kWh': 1.0})
+
+        assert series.sync_energy_usage("u", "b", store) == 1
+        generation = store._index(building_key("u", "b"))['generation']
+        assert series.sync_energy_usage("u", "b", store) == 0
+        assert store._index(building_key("u", "b"))['generation'] == generation
+
+    def test_sync_picks_up_newer_readings(self, store, readings):
+        readings.append({'timestamp': datetime.fromtimestamp(START, timezone.utc), 'energy_usage_kWh': 1.0})
+        series.sync_energy_usage("u", "b", store)
+        readings.append({'timestamp': datetime.fromtimestamp(START + 1, timezone.utc), 'energy_usage_kWh': 2.0})
+
+        assert series.sync_energy_usage("u", "b", store) == 1
+        assert store.series(building_key("u", "b"))[1].tolist() == [1.0, 2.0]
@@ -0,0 +1,111 @@
+import threading
+import time
+import pytest
+import weather
+from weather import WeatherCache, block_expiry
+
+
+class TestBlockExpiry:
+    def test_current_expires_on_quarter_hour(self):
+        now = 1767225600 + 20 * 60  # 2026-01-01 00:20 UTC
+        assert block_expiry("current", "gfs_seamless", now) == 1767225600 + 30 * 60
+
+    def test_hourly_expires_when_next_run_is_published(self):
+        midnight = 1767225600  # 2026-01-01 00:00 UTC
+        # The 00z run is published at 04:00, the 06z run at 10:00
+        assert block_expiry("hourly", "gfs_seamless", midnight + 3600) == midnight + 4 * 3600
+        assert block_expiry("hourly", "gfs_seamless", midnight + 5 * 3600) == midnight + 10 * 3600
+
+
+class TestWeatherCache:
+    def test_fresh_entry_is_not_refetched(self):
+        cache = WeatherCache()
+        calls = []
+        fetch = lambda: calls.append(1) or len(calls)
+
+        assert cache.get("k", fetch, lambda now: now + 60) == 1
+        assert cache.get("k", fetch, lambda now: now + 60) == 1
+        assert len(calls) == 1
+
+    def test_version_tracks_entry(self):
+        cache = WeatherCache()
+        assert cache.version("k") is None
+
+        cache.get("k", lambda: "value", lambda now: now + 60)
+        fetched_at, expires_at = cache.version("k")
+
+        assert expires_at == pytest.approx(fetched_at + 60)
+
+    def test_concurrent_misses_share_one_fetch(self):
+        cache = WeatherCache()
+        calls = []
+        started = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return "value"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get("k", fetch, lambda now: now + 60)))
+                   for _ in range(5)]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert results == ["value"] * 5
+
+    def test_failed_miss_raises_for_all_waiters(self):
+        cache = WeatherCache()
+
+        def fetch():
+            time.sleep(0.1)
+            raise RuntimeError("Open-Meteo down")
+
+        errors = []
+        def get():
+            try:
+                cache.get("k", fetch, lambda now: now + 60)
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=get) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == ["Open-Meteo down"] * 3
+
+    def test_stale_entry_is_served_while_refreshing_once(self):
+        cache = WeatherCache()
+        cache.get("k", lambda: "old", lambda now: now - 1)
+        old_version = cache.version("k")
+        refreshed = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            refreshed.wait()
+            return "new"
+
+        assert cache.get("k", fetch, lambda now: now + 60) == "old"
+        assert cache.get("k", fetch, lambda now: now + 60) == "old"
+        refreshed.set()
+        for _ in range(100):
+            if cache.version("k") != old_version:
+                break
+            time.sleep(0.01)
+
+        assert cache.get("k", fetch, lambda now: now + 60) == "new"
+        assert len(calls) == 1
+
+    def test_entry_too_stale_is_fetched_inline(self):
+        cache = WeatherCache()
+        cache.get("k", lambda: "old", lambda now: now - weather.STALE_GRACE - 1)
+        assert cache.get("k", lambda: "new", lambda now: now + 60) == "new"
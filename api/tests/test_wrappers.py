@@ -0,0 +1,65 @@
+import pytest
+from flask import Flask, g, jsonify
+from wrappers import conditional_response
+
+
+@pytest.fixture
+def versions():
+    return {"building": ("v1", 60)}
+
+
+@pytest.fixture
+def client(versions):
+    app = Flask(__name__)
+
+    @app.before_request
+    def set_user():
+        g.user_id = "user"
+
+    @app.route('/data/<name>')
+    @conditional_response(lambda user_id, name: versions.get(name))
+    def data(name):
+        if name == "broken":
+            return jsonify({'message': 'upstream failed'}), 502
+        return jsonify({'name': name, 'version': versions.get(name)}), 200
+
+    return app.test_client()
+
+
+class TestConditionalResponse:
+    def test_tags_cached_data(self, client):
+        response = client.get('/data/building')
+        assert response.status_code == 200
+        assert response.headers['ETag']
+        assert response.headers['Cache-Control'] == 'private, max-age=60'
+
+    def test_not_modified_while_fresh(self, client):
+        etag = client.get('/data/building').headers['ETag']
+        response = client.get('/data/building', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+
+    def test_new_version_sends_body(self, client, versions):
+        etag = client.get('/data/building').headers['ETag']
+        versions["building"] = ("v2", 60)
+        response = client.get('/data/building', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    def test_expired_version_revalidates_through_route(self, client, versions):
+        etag = client.get('/data/building').headers['ETag']
+        versions["building"] = ("v1", 0)
+        response = client.get('/data/building', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.headers['Cache-Control'] == 'private, max-age=0'
+
+    def test_errors_are_not_tagged(self, client, versions):
+        versions["broken"] = ("v1", 60)
+        response = client.get('/data/broken')
+        assert response.status_code == 502
+        assert 'ETag' not in response.headers
+
+    def test_uncached_data_is_not_tagged(self, client):
+        response = client.get('/data/missing')
+        assert response.status_code == 200
+        assert 'ETag' not in response.headers
@@ -1,27 +1,198 @@
 import openmeteo_requests
-import requests_cache
+import requests
 import pandas as pd
 from retry_requests import retry
 from geopy.geocoders import Nominatim
 import ssl
 import certifi
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
 
-def fetch_weather_data(lat, lon, timezone, temperature_unit="fahrenheit", wind_speed_unit="mph", precipitation_unit="inch", models="gfs_seamless"):
+# Open-Meteo updates current conditions every 15 minutes
+CURRENT_WEATHER_TTL = 900
+
+# Run interval and delay until the run is published, in seconds, per weather model
+MODEL_RUN_CADENCE = {
+    "gfs_seamless": (6 * 3600, 4 * 3600),
+    "gfs_hrrr": (3600, 2 * 3600),
+}
+DEFAULT_RUN_CADENCE = (3600, 0)
+
+# How long past expiry an entry is still served while it is refreshed in the background
+STALE_GRACE = 3 * 3600
+
+# Locations not requested for this long are dropped instead of being kept fresh
+INACTIVE_AFTER = 24 * 3600
+
+# Exponential backoff bounds for failed background refreshes
+REFRESH_BACKOFF = 60
+MAX_REFRESH_BACKOFF = 3600
+
+
+def block_expiry(block: str, models: str, now: float) -> float:
+    """
+    Compute when a weather data block fetched now should be considered stale.
+
+    Args:
+        block (str): The Open-Meteo data block, "current" or "hourly".
+        models (str): The weather model the block was fetched from.
+        now (float): The fetch time as a UNIX timestamp.
+
+    Returns:
+        float: The expiry time as a UNIX timestamp.
+    """
+    if block == "current":
+        return now - now % CURRENT_WEATHER_TTL + CURRENT_WEATHER_TTL
+
+    # Forecasts only change when the next model run is published
+    cadence, delay = MODEL_RUN_CADENCE.get(models, DEFAULT_RUN_CADENCE)
+    next_run = now - delay - (now - delay) % cadence + cadence
+    return next_run + delay
+
+
+class WeatherCache:
+    """
+    In-process weather cache with stale-while-revalidate.
+
+    Fresh entries are returned directly. Entries past expiry but within STALE_GRACE are
+    returned immediately while a single background refresh per entry updates them.
+    Only missing or very stale entries make the caller wait on Open-Meteo, and concurrent
+    callers waiting on the same entry share a single fetch.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple, Dict[str, Any]] = {}
+        self._pending: Dict[Tuple, Dict[str, Any]] = {}
+        self._last_sweep = 0.0
+
+    def get(self, key: Tuple, fetch: Callable[[], Any], expiry: Callable[[float], float]) -> Any:
+        """
+        Get the cached value for a key, fetching or refreshing it as needed.
+
+        Args:
+            key (Tuple): The cache key.
+            fetch (Callable[[], Any]): Fetches a fresh value.
+            expiry (Callable[[float], float]): Returns the expiry time for a value fetched at the given time.
+
+        Returns:
+            Any: The cached or freshly fetched value.
+
+        Raises:
+            Exception: Whatever the fetch raised, if the value had to be fetched and the fetch failed.
+        """
+        now = time.time()
+        with self._lock:
+            self._sweep(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["last_access"] = now
+                if now < entry["expires_at"]:
+                    return entry["value"]
+                if now < entry["expires_at"] + STALE_GRACE:
+                    if not entry["refreshing"] and now >= entry["retry_at"]:
+                        entry["refreshing"] = True
+                        threading.Thread(target=self._refresh, args=(key, fetch, expiry), daemon=True).start()
+                    return entry["value"]
+
+            # Only the first caller fetches a missing entry, the others wait for its result
+            pending = self._pending.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._pending[key] = {"done": threading.Event(), "error": None}
+
+        if not leader:
+            pending["done"].wait()
+            if pending["error"] is not None:
+                raise pending["error"]
+            with self._lock:
+                return self._entries[key]["value"]
+
+        try:
+            value = fetch()
+            self._store(key, value, expiry)
+            return value
+        except Exception as e:
+            pending["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending["done"].set()
+
+    def version(self, key: Tuple) -> Optional[Tuple[float, float]]:
+        """
+        Get the version of a cached entry without fetching or refreshing it.
+
+        Args:
+            key (Tuple): The cache key.
+
+        Returns:
+            Optional[Tuple[float, float]]: The fetch time and expiry time of the entry, or None if it is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            return entry["fetched_at"], entry["expires_at"]
+
+    def _store(self, key: Tuple, value: Any, expiry: Callable[[float], float]):
+        """Store a freshly fetched value."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            self._entries[key] = {
+                "value": value,
+                "fetched_at": now,
+                "expires_at": expiry(now),
+                "last_access": entry["last_access"] if entry else now,
+                "refreshing": False,
+                "failures": 0,
+                "retry_at": 0.0,
+            }
+
+    def _refresh(self, key: Tuple, fetch: Callable[[], Any], expiry: Callable[[float], float]):
+        """Refresh an entry in the background, backing off if the fetch fails."""
+        try:
+            value = fetch()
+        except Exception:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry["failures"] += 1
+                    entry["refreshing"] = False
+                    entry["retry_at"] = time.time() + min(REFRESH_BACKOFF * 2 ** (entry["failures"] - 1), MAX_REFRESH_BACKOFF)
+            return
+
+        self._store(key, value, expiry)
+
+    def _sweep(self, now: float):
+        """Drop entries for locations that have not been requested recently. Caller holds the lock."""
+        if now - self._last_sweep < CURRENT_WEATHER_TTL:
+            return
+        self._last_sweep = now
+        for key in [key for key, entry in self._entries.items()
+                    if now - entry["last_access"] > INACTIVE_AFTER and not entry["refreshing"]]:
+            del self._entries[key]
+
+
+# Shared weather cache for the API process
+weather_cache = WeatherCache()
+
+
+def _weather_response(lat, lon, timezone, block, variables, temperature_unit, wind_speed_unit, precipitation_unit, models):
     """
-    Fetch weather data for a given latitude and longitude using Open-Meteo API.
+    Request a single data block from the Open-Meteo API.
     """
-    # Setup the session with caching and retry
-    cache_session = requests_cache.CachedSession('.cache', expire_after=3600)
-    retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
+    retry_session = retry(requests.Session(), retries=5, backoff_factor=0.2)
     openmeteo = openmeteo_requests.Client(session=retry_session)
 
-    # API endpoint and parameters
     url = "https://api.open-meteo.com/v1/forecast"
     params = {
         "latitude": lat,
         "longitude": lon,
-        "current": ["temperature_2m", "is_day", "rain"],
-        "hourly": ["temperature_2m", "rain"],
+        block: variables,
         "temperature_unit": temperature_unit,
         "wind_speed_unit": wind_speed_unit,
         "precipitation_unit": precipitation_unit,
@@ -29,20 +200,59 @@ def fetch_weather_data(lat, lon, timezone, temperature_unit="fahrenheit", wind_s
         "models": models
     }
 
-    # Make the API request
     responses = openmeteo.weather_api(url, params=params)
-    response = responses[0]  # Process the first location
-
-    # Current values
-    current = response.Current()
-    current_data = {
-        "time": current.Time(),
-        "temperature_2m": current.Variables(0).Value(),
-        "is_day": current.Variables(1).Value(),
-        "rain": current.Variables(2).Value()
-    }
+    return responses[0]  # Process the first location
+
 
-    return current_data
+def fetch_weather_data(lat, lon, timezone, temperature_unit="fahrenheit", wind_speed_unit="mph", precipitation_unit="inch", models="gfs_seamless"):
+    """
+    Fetch current weather data for a given latitude and longitude using Open-Meteo API.
+    Served from the weather cache, refreshed every 15 minutes.
+    """
+    def fetch():
+        response = _weather_response(lat, lon, timezone, "current", ["temperature_2m", "is_day", "rain"],
+                                     temperature_unit, wind_speed_unit, precipitation_unit, models)
+        current = response.Current()
+        return {
+            "time": current.Time(),
+            "temperature_2m": current.Variables(0).Value(),
+            "is_day": current.Variables(1).Value(),
+            "rain": current.Variables(2).Value()
+        }
+
+    key = ("current", lat, lon, timezone, temperature_unit, wind_speed_unit, precipitation_unit, models)
+    return weather_cache.get(key, fetch, lambda now: block_expiry("current", models, now))
+
+
+def fetch_hourly_weather_data(lat, lon, timezone, temperature_unit="fahrenheit", wind_speed_unit="mph", precipitation_unit="inch", models="gfs_seamless"):
+    """
+    Fetch the hourly weather forecast for a given latitude and longitude using Open-Meteo API.
+    Served from the weather cache, refreshed when the model publishes a new run.
+    """
+    def fetch():
+        response = _weather_response(lat, lon, timezone, "hourly", ["temperature_2m", "rain"],
+                                     temperature_unit, wind_speed_unit, precipitation_unit, models)
+        hourly = response.Hourly()
+        return pd.DataFrame({
+            "time": pd.date_range(
+                start=pd.to_datetime(hourly.Time(), unit="s", utc=True),
+                end=pd.to_datetime(hourly.TimeEnd(), unit="s", utc=True),
+                freq=pd.Timedelta(seconds=hourly.Interval()),
+                inclusive="left"
+            ),
+            "temperature_2m": hourly.Variables(0).ValuesAsNumpy(),
+            "rain": hourly.Variables(1).ValuesAsNumpy()
+        })
+
+    key = ("hourly", lat, lon, timezone, temperature_unit, wind_speed_unit, precipitation_unit, models)
+    return weather_cache.get(key, fetch, lambda now: block_expiry("hourly", models, now))
+
+def get_weather_version(lat, lon, timezone, block="current", temperature_unit="fahrenheit", wind_speed_unit="mph", precipitation_unit="inch", models="gfs_seamless"):
+    """
+    Get the fetch and expiry time of the cached weather data for a location, without requesting it.
+    Returns None if the data is not cached.
+    """
+    return weather_cache.version((block, lat, lon, timezone, temperature_unit, wind_speed_unit, precipitation_unit, models))
 
 def describe_weather(temperature, is_day, rain):
     """
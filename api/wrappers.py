@@ -1,8 +1,9 @@
 #decorators.py
-from flask import request, g
-from typing import Callable, Dict, Tuple, Union, Any
+from flask import request, g, make_response
+from typing import Callable, Dict, Optional, Tuple, Union, Any
 from functools import wraps
 from firebase_admin import auth
+import hashlib
 
 def verify_token(f: Callable) -> Callable:
     """
@@ -56,4 +57,62 @@ def verify_token(f: Callable) -> Callable:
         except Exception as e:
             return {'message': str(e)}, 500
 
-    return decorated
\ No newline at end of file
+    return decorated
+
+def conditional_response(version: Callable[..., Optional[Tuple[str, int]]]) -> Callable:
+    """
+    Decorator that adds ETag and Cache-Control headers to a route and answers
+    If-None-Match requests with 304, before the route does any work while the data is fresh.
+    Must be applied below verify_token, as the ETag is scoped to g.user_id.
+
+    Only 200 responses whose data version did not change while the route ran are tagged,
+    so errors and responses that raced a cache refresh are never cached by the client.
+
+    Args:
+        version (Callable[..., Optional[Tuple[str, int]]]): Called with the user ID and the route's
+            keyword arguments. Returns the version of the cached data the route would send and the
+            seconds until it expires, or None if the data is not cached. Must not call upstream services.
+
+    Returns:
+        If the client's ETag matches: Empty 304 response
+        Otherwise: Original route response, with ETag set if it can be cached
+
+    Usage:
+        @app.route('/building/<building_name>')
+        @verify_token
+        @conditional_response(get_building_version)
+        def building_route(building_name):
+            return {'name': building_name}
+    """
+    def tag(response, data_version: str, max_age: int):
+        response.set_etag(hashlib.sha1(f"{g.user_id}:{data_version}".encode()).hexdigest())
+        response.headers['Cache-Control'] = f"private, max-age={max_age}"
+        response.vary.add('Authorization')
+        return response
+
+    def matches(data_version: str) -> bool:
+        return request.if_none_match.contains(hashlib.sha1(f"{g.user_id}:{data_version}".encode()).hexdigest())
+
+    def decorator(f: Callable) -> Callable:
+        @wraps(f)
+        def decorated(*args, **kwargs) -> Any:
+            before = version(g.user_id, **kwargs)
+            # Expired data is revalidated by running the route, which refreshes it
+            if before is not None and before[1] > 0 and matches(before[0]):
+                return tag(make_response('', 304), *before)
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+            after = version(g.user_id, **kwargs)
+            if after is None or (before is not None and before[0] != after[0]):
+                return response
+
+            if matches(after[0]):
+                response = make_response('', 304)
+            return tag(response, *after)
+
+        return decorated
+
+    return decorator
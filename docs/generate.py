@@ -1,7 +1,14 @@
 import ast
+import hashlib
+import json
 import os
 import re
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+# Parsed Python files, keyed by path with their content hash
+CACHE_FILE = "docs/.generate_cache.json"
+CACHE_VERSION = 1
 
 def generate_structure(root_dirs, output_file):
     """
@@ -11,46 +18,58 @@ def generate_structure(root_dirs, output_file):
         root_dirs (list of str): List of directories to include in the structure documentation.
         output_file (str): Path of the file to write the generated structure documentation.
     """
-    def format_directory_structure(dir_path, prefix=""):
+    def write_directory_structure(f, dir_path, prefix=""):
         """
-        Recursively formats the structure of a directory and its subdirectories/files.
+        Recursively writes the structure of a directory and its subdirectories/files.
 
         Args:
+            f (file): The file to write to.
             dir_path (str): The path of the directory to format.
             prefix (str): The prefix to add to each line for hierarchical structure.
-        
-        Returns:
-            str: Formatted string representing the directory structure.
         """
-        structure = ""
         for item in sorted(os.listdir(dir_path)):
             if item == '__pycache__':
                 continue
             full_path = os.path.join(dir_path, item)
             if os.path.isdir(full_path):
-                structure += f"{prefix}- {item}/\n"
-                structure += format_directory_structure(full_path, prefix + "  ")
+                f.write(f"{prefix}- {item}/\n")
+                write_directory_structure(f, full_path, prefix + "  ")
             else:
-                structure += f"{prefix}- {item}\n"
-        return structure
+                f.write(f"{prefix}- {item}\n")
 
-    # Start building the document content
-    doc_content = "# Project Folder Structure\n\n"
-    for root_dir in root_dirs:
-        doc_content += f"{root_dir}/\n"
-        doc_content += format_directory_structure(root_dir)
-        doc_content += "\n"
+    with open(output_file, 'w') as f:
+        f.write("# Project Folder Structure\n\n")
+        for root_dir in root_dirs:
+            if not os.path.isdir(root_dir):
+                continue
+            f.write(f"{root_dir}/\n")
+            write_directory_structure(f, root_dir)
+            f.write("\n")
 
-    # Add a note about config files in the root
-    doc_content += "Config files are in root\n"
+        # Add a note about config files in the root
+        f.write("Config files are in root\n")
+
+def iter_documented_functions(body, prefix=""):
+    """
+    Yields the module and class level functions in an AST body, without descending into function bodies.
+
+    Args:
+        body (list of ast.stmt): The statements to search.
+        prefix (str): Qualified name of the enclosing classes.
+
+    Yields:
+        Tuple[str, ast.FunctionDef]: The qualified prefix and the function node.
+    """
+    for node in body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            yield prefix, node
+        elif isinstance(node, ast.ClassDef):
+            yield from iter_documented_functions(node.body, f"{prefix}{node.name}.")
 
-    # Write to the output file
-    with open(output_file, 'w') as f:
-        f.write(doc_content)
-        
 def extract_functions_from_python(file_path: str) -> List[str]:
     """
     Extracts functions and their docstrings from a Python file.
+    Nested functions are skipped, methods are qualified with their class name.
 
     Args:
         file_path (str): The path to the Python file.
@@ -63,64 +82,111 @@ def extract_functions_from_python(file_path: str) -> List[str]:
 
     tree = ast.parse(file_content)
     functions_info = []
+    module_path = file_path.replace("/", ".").replace("\\", ".").replace(".py", "")
+
+    for prefix, node in iter_documented_functions(tree.body):
+        # Extract function signature
+        args_with_types = []
+        for arg in node.args.args:
+            if arg.annotation:
+                args_with_types.append(f"{arg.arg}: {ast.unparse(arg.annotation)}")
+            else:
+                args_with_types.append(arg.arg)
+        arg_string = ", ".join(args_with_types)
+
+        # Determine the return type if it exists
+        return_annotation = ""
+        if node.returns:
+            return_annotation = f" -> {ast.unparse(node.returns)}"
 
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef):
-            # Extract function signature
-            func_name = node.name
-            args = [arg.arg for arg in node.args.args]
-            args_with_types = []
-            for arg in node.args.args:
-                if arg.annotation:
-                    args_with_types.append(f"{arg.arg}: {ast.unparse(arg.annotation)}")
-                else:
-                    args_with_types.append(arg.arg)
-            arg_string = ", ".join(args_with_types)
-
-            # Determine the return type if it exists
-            return_annotation = ""
-            if node.returns:
-                return_annotation = f" -> {ast.unparse(node.returns)}"
-
-            signature = f"{func_name}({arg_string}){return_annotation}"
-
-            # Extract docstring
-            docstring = ast.get_docstring(node) or ""
-            docstring_lines = docstring.split("\n")
-            formatted_docstring = "\n    ".join(docstring_lines)
-
-            # Build the final format
-            module_path = file_path.replace("/", ".").replace("\\", ".").replace(".py", "")
-            function_info = f"`{module_path}.{signature}`\n{"```\n"+formatted_docstring+"\n```"}"
-            functions_info.append(function_info)
+        signature = f"{prefix}{node.name}({arg_string}){return_annotation}"
+
+        # Extract docstring
+        docstring = ast.get_docstring(node) or ""
+        formatted_docstring = "\n    ".join(docstring.split("\n"))
+
+        # Build the final format
+        functions_info.append(f"`{module_path}.{signature}`\n```\n{formatted_docstring}\n```")
 
     return functions_info
 
+def load_cache(cache_file: str) -> Dict[str, dict]:
+    """
+    Loads the cache of parsed files, empty if it is missing or unreadable.
 
-def generate_functions_documentation(root_dirs, output_file):
+    Args:
+        cache_file (str): Path of the cache file.
+
+    Returns:
+        Dict[str, dict]: Content hash and extracted functions for each file path.
+    """
+    try:
+        with open(cache_file, "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if cache.get("version") == CACHE_VERSION else {}
+
+def save_cache(cache_file: str, cache: Dict[str, dict]):
+    """
+    Saves the cache of parsed files.
+
+    Args:
+        cache_file (str): Path of the cache file.
+        cache (Dict[str, dict]): Content hash and extracted functions for each file path.
+    """
+    tmp_file = cache_file + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump({**cache, "version": CACHE_VERSION}, f)
+    os.replace(tmp_file, cache_file)
+
+def generate_functions_documentation(root_dirs, output_file, cache_file=None):
     """
     Generates a documentation file listing all functions in the Python files in the given directories,
     with their signatures and docstrings.
 
+    Only files whose content changed since the last run are parsed, in a process pool.
+
     Args:
         root_dirs (list of str): List of directories to scan for Python files.
         output_file (str): Path of the file to write the generated function documentation.
+        cache_file (str, optional): Path of the parse cache. Defaults to CACHE_FILE.
     """
-    doc_content = "# Backend Function Documentaion\n\n"
+    cache_file = cache_file or CACHE_FILE
+    cache = load_cache(cache_file)
+    cache.pop("version", None)
+
+    file_paths = []
     for root_dir in root_dirs:
-        for subdir, _, files in os.walk(root_dir):
-            for file_name in files:
+        for subdir, dirs, files in os.walk(root_dir):
+            dirs.sort()
+            for file_name in sorted(files):
                 if file_name.endswith(".py") and file_name != "generate.py":
-                    file_path = os.path.join(subdir, file_name)
-                    functions_info = extract_functions_from_python(file_path)
-                    if functions_info:
-                        doc_content += f"## {file_path.replace("\\","/")}\n"
-                        for function_info in functions_info:
-                            doc_content += f"{function_info}\n\n"
+                    file_paths.append(os.path.join(subdir, file_name))
+
+    hashes = {}
+    for file_path in file_paths:
+        with open(file_path, "rb") as f:
+            hashes[file_path] = hashlib.sha256(f.read()).hexdigest()
+
+    changed = [path for path in file_paths if cache.get(path, {}).get("hash") != hashes[path]]
+    if changed:
+        with ProcessPoolExecutor() as executor:
+            for file_path, functions_info in zip(changed, executor.map(extract_functions_from_python, changed)):
+                cache[file_path] = {"hash": hashes[file_path], "functions": functions_info}
 
     with open(output_file, 'w') as f:
-        f.write(doc_content)
-        
+        f.write("# Backend Function Documentaion\n\n")
+        for file_path in file_paths:
+            functions_info = cache[file_path]["functions"]
+            if functions_info:
+                f.write(f"## {file_path.replace(os.sep, '/')}\n")
+                for function_info in functions_info:
+                    f.write(f"{function_info}\n\n")
+
+    # Drop files that no longer exist
+    save_cache(cache_file, {path: cache[path] for path in file_paths})
+
 def extract_function_from_js(file_path: str) -> List[str]:
     """
     Extracts JSDoc comments and the line immediately following them from a JavaScript file.
@@ -147,7 +213,7 @@ def extract_function_from_js(file_path: str) -> List[str]:
         formatted_jsdoc = "\n    ".join(jsdoc_comment.splitlines())
 
         # Format the output for documentation
-        functions_info.append(f"{formatted_jsdoc.replace("    ","")}\n    {following_line.replace("\t","")}")
+        functions_info.append(f"{formatted_jsdoc.replace('    ', '')}\n    {following_line.replace(chr(9), '')}")
 
     return functions_info
 
@@ -159,21 +225,20 @@ def generate_js_functions_documentation(root_dirs, output_file):
         root_dirs (list of str): List of directories to scan for JavaScript/JSX files.
         output_file (str): Path of the file to write the generated function documentation.
     """
-    doc_content = "\n# Frontend Function Documentation\n\n"
-    for root_dir in root_dirs:
-        for subdir, _, files in os.walk(root_dir):
-            for file_name in files:
-                if file_name.endswith((".js", ".jsx")):
-                    file_path = os.path.join(subdir, file_name)
-                    functions_info = extract_function_from_js(file_path)
-                    if functions_info:
-                        doc_content += f"## {file_path.replace(os.sep, '/')}\n\n"
-                        for function_info in functions_info:
-                            doc_content += f"{function_info}\n\n"
-
     # Append the content to the existing file or create it if it doesn't exist
     with open(output_file, 'a') as f:
-        f.write(doc_content)
+        f.write("\n# Frontend Function Documentation\n\n")
+        for root_dir in root_dirs:
+            for subdir, dirs, files in os.walk(root_dir):
+                dirs.sort()
+                for file_name in sorted(files):
+                    if file_name.endswith((".js", ".jsx")):
+                        file_path = os.path.join(subdir, file_name)
+                        functions_info = extract_function_from_js(file_path)
+                        if functions_info:
+                            f.write(f"## {file_path.replace(os.sep, '/')}\n\n")
+                            for function_info in functions_info:
+                                f.write(f"{function_info}\n\n")
 
 
 if __name__ == "__main__":